@@ -1,131 +1,524 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file
+from flask.json import JSONEncoder
 from flask_cors import CORS
 import mimetypes
 import os
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
 from pdf2docx import Converter
-from PIL import Image
-import uuid
+import PIL
+from PIL import Image, features
+import numpy as np
+import re
+import secrets
+import io
 import tempfile
 import shutil
 import sys
-from threading import Timer
+import threading
+import heapq
+import math
+import multiprocessing
+from multiprocessing import current_process
 import time
 import json
-from werkzeug.utils import secure_filename
-from PyPDF2 import PdfReader, PdfWriter
-
-# Configure logging to output to stdout
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+import functools
+import hashlib
+import magic
+import orjson
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.utils import safe_join
+from celery import Celery
+from celery.result import AsyncResult
+from celery.signals import worker_process_init
+from diskcache import Cache
+
+# Configure logging to output to stdout; records are queued and written by a
+# listener thread so request threads never wait on the stdout lock
+def start_log_listener():
+    """Route root logging through a queue drained by a listener thread"""
+    global log_listener, log_queue_handler
+    log_queue = queue.SimpleQueue()
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    log_listener = QueueListener(log_queue, stdout_handler, respect_handler_level=True)
+    log_queue_handler = QueueHandler(log_queue)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.handlers = [log_queue_handler]
+    log_listener.start()
+
+def restart_log_listener():
+    """Drain the inherited handlers with a new listener thread in a forked child"""
+    global log_listener
+    # Whoever replaced the root handlers (e.g. Celery's worker) owns logging now; and
+    # sys.stdout may have been redirected into logging, so the inherited handlers are kept
+    if log_queue_handler not in logging.getLogger().handlers:
+        return
+    log_queue = queue.SimpleQueue()
+    log_queue_handler.queue = log_queue
+    log_listener = QueueListener(log_queue, *log_listener.handlers, respect_handler_level=True)
+    log_listener.start()
+
+start_log_listener()
+# The listener thread does not survive fork, so forked children start their own
+os.register_at_fork(after_in_child=restart_log_listener)
+atexit.register(lambda: log_listener.stop())
 logger = logging.getLogger(__name__)
 
+class HashingSpoolFile:
+    """Spool file that hashes the upload as the form parser writes it"""
+    
+    def __init__(self, spool, request):
+        self._spool = spool
+        self._request = request
+        self.sha256 = hashlib.sha256()
+    
+    def write(self, data):
+        # Chunked requests have no Content-Length for Werkzeug to check, so the
+        # upload cap is enforced on the bytes spooled so far
+        self._request.spooled_length += len(data)
+        if self._request.spooled_length > self._request.max_content_length:
+            self._spool.close()
+            os.remove(self._spool.name)
+            raise RequestEntityTooLarge()
+        self.sha256.update(data)
+        return self._spool.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self._spool, name)
+
+class HeadOnlySpool(io.BytesIO):
+    """In-memory spool that keeps only the leading bytes of an upload"""
+    
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+    
+    def write(self, data):
+        room = self.limit - self.tell()
+        if room > 0:
+            super().write(data[:room])
+        return len(data)
+
+class DiskSpoolingRequest(Request):
+    """Request that spools every uploaded file straight to a named file on disk"""
+    
+    # Bytes of this request's uploads written to spool files
+    spooled_length = 0
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Format detection only looks at the header, so nothing touches the disk
+        if self.endpoint == 'detect_file_format':
+            return HeadOnlySpool(DETECT_HEAD_BYTES)
+        
+        spool = tempfile.NamedTemporaryFile('wb+', buffering=COPY_BUFFER_SIZE, dir=UPLOAD_DIR,
+                                            prefix='spool_', delete=False)
+        # Spooled files that are never moved into place expire like any upload
+        schedule_cleanup(spool.name)
+        return HashingSpoolFile(spool, self)
+
+class OrjsonEncoder(JSONEncoder):
+    """JSON encoder that serializes with orjson, so every jsonify call uses it.
+    
+    Flask's default() still handles the types orjson doesn't know.
+    """
+    
+    def encode(self, o):
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(o, default=self.default, option=option).decode()
+
 app = Flask(__name__)
+app.request_class = DiskSpoolingRequest
+app.json_encoder = OrjsonEncoder
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 100)) * 1024 * 1024
 
 # Configure CORS with specific settings
 CORS(app, 
      resources={r"/*": {
          "origins": ["https://convert-x.vercel.app", "http://localhost:3000"],
-         "methods": ["GET", "POST", "OPTIONS"],
+         "methods": ["GET", "POST", "PUT", "OPTIONS"],
          "allow_headers": ["Content-Type", "Authorization", "Accept"],
          "expose_headers": ["Content-Type", "Authorization"],
          "supports_credentials": False,
          "max_age": 3600
      }})
 
-# Create persistent directories for file storage
-UPLOAD_DIR = os.path.join(tempfile.gettempdir(), 'convertx_uploads')
-CONVERTED_DIR = os.path.join(tempfile.gettempdir(), 'convertx_converted')
+# Create persistent directories for file storage; point STORAGE_DIR at a disk-backed
+# volume when the temp dir is tmpfs so uploads don't sit in RAM
+STORAGE_DIR = os.environ.get('STORAGE_DIR', tempfile.gettempdir())
+UPLOAD_DIR = os.path.join(STORAGE_DIR, 'convertx_uploads')
+CONVERTED_DIR = os.path.join(STORAGE_DIR, 'convertx_converted')
+# Buffer size for moving upload bytes to disk
+COPY_BUFFER_SIZE = 1 << 20
 
 # Ensure directories exist
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(CONVERTED_DIR, exist_ok=True)
 
-# Dictionary to store file expiry times
-file_expiry = {}
+# Magic-byte signatures for the formats this app converts
+SIGNATURES = {
+    b'%PDF-': 'PDF',
+    b'\x89PNG': 'PNG',
+    b'\xff\xd8\xff': 'JPEG',
+    b'PK\x03\x04': 'ZIP',
+}
+# ZIP-based formats that are told apart by their extension
+ZIP_CONTAINER_FORMATS = {'DOCX', 'XLSX', 'PPTX'}
+# Format names for known MIME types and extensions, computed once at import
+mimetypes.init()
+FORMAT_FROM_MIME = {mime: mime.split('/', 1)[1].upper() for mime in mimetypes.types_map.values()}
+FORMAT_FROM_EXTENSION = {ext: ext[1:].upper() for ext in mimetypes.types_map}
+# Leading bytes of an upload used for format detection
+DETECT_HEAD_BYTES = 4096
+# libmagic answers that say nothing about the format
+GENERIC_MIME_TYPES = {'application/octet-stream', 'inode/x-empty', 'application/x-empty'}
+file_magic = magic.Magic(mime=True)
+
+# Pillow's default MAX_IMAGE_PIXELS guards against decompression bombs; JPEGs whose long
+# side exceeds MAX_IMAGE_DIMENSION are decoded downscaled by libjpeg
+MAX_IMAGE_DIMENSION = 4096
+# Optimized Huffman tables cost Pillow a second, non-SIMD pass over the image
+JPEG_OPTIMIZE = os.environ.get('JPEG_OPTIMIZE', '0') == '1'
+# Progressive JPEGs render incrementally but encode several times slower (libjpeg also
+# forces optimized Huffman tables for them); opt in with JPEG_PROGRESSIVE=1
+JPEG_PROGRESSIVE = os.environ.get('JPEG_PROGRESSIVE', '0') == '1'
+# Output names Pillow and libjpeg-turbo treat as JPEG
+JPEG_FORMATS = frozenset({'JPG', 'JPEG'})
+# At this quality a same-format re-encode only loses detail (JPEG) or skips compression (PNG)
+IDENTITY_COPY_MIN_QUALITY = 95
+
+# libjpeg-turbo's SIMD codec for JPEG output; Pillow handles JPEG when it is missing
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB, TJSAMP_420, TJFLAG_PROGRESSIVE
+    turbo_jpeg = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    turbo_jpeg = None
+
+# nvJPEG through torchvision on CUDA hosts; opt in with GPU_JPEG=1. Only large JPEGs
+# amortize the transfer and kernel launches, smaller ones stay on the CPU codecs
+GPU_JPEG_MIN_PIXELS = 4_000_000
+gpu_jpeg = False
+if os.environ.get('GPU_JPEG', '0') == '1':
+    try:
+        import torch
+        from torchvision.io import decode_jpeg, encode_jpeg, ImageReadMode
+        gpu_jpeg = torch.cuda.is_available()
+    except ImportError:
+        pass
+
+# Size of the per-process pool that runs the conversions of a batch. Every gunicorn worker
+# keeps its own warmed pool, so by default the CPUs are split between the workers
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 2))
+CONVERSION_PROCESSES = int(os.environ.get('CONVERSION_PROCESSES',
+                                          max(1, (os.cpu_count() or 2) // WEB_CONCURRENCY)))
+conversion_pool = None
+conversion_pool_pid = None
+conversion_pool_lock = threading.Lock()
+
+# Optional Celery task queue; conversions run inline when no broker is configured. Workers
+# read uploads and write outputs under STORAGE_DIR, so it must be shared with the web processes
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL and 'STORAGE_DIR' not in os.environ:
+    raise RuntimeError('REDIS_URL is set but STORAGE_DIR is not; point it at storage shared '
+                       'by the web and worker processes')
+celery = Celery('convertx', broker=REDIS_URL, backend=REDIS_URL) if REDIS_URL else None
+if celery is not None:
+    # Report STARTED once a worker picks a task up; PENDING then only means queued (or unknown)
+    celery.conf.task_track_started = True
+# Queued uploads expire when their task finishes; this catches tasks that never run
+QUEUED_INPUT_EXPIRY_MINUTES = 60
+
+# PDFs with at least this many pages are parsed across worker processes
+PARALLEL_PDF_MIN_PAGES = 20
+# Largest page range handed to a single worker process
+PDF_SHARD_PAGES = 300
+# Page parsing leaves one CPU for the process serving requests
+PDF_PAGE_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# Page pools must not fork the threaded web process. A forkserver forks them from a clean
+# single-threaded server with the conversion libraries preloaded; spawn is the portable fallback
+if 'forkserver' in multiprocessing.get_all_start_methods():
+    pdf_page_context = multiprocessing.get_context('forkserver')
+    pdf_page_context.set_forkserver_preload(['pdf2docx', 'fitz', 'PIL.Image'])
+else:
+    pdf_page_context = multiprocessing.get_context('spawn')
+# Only one conversion per process fans out at a time, so concurrent requests on a worker's
+# threads don't oversubscribe the CPUs; separate gunicorn workers can still overlap
+pdf_pool_lock = threading.Lock()
+# Cleared in batch pool workers, whose siblings already keep the other CPUs busy
+parallel_pdf_pages = True
+
+# Converted outputs keyed by upload digest, output format and settings; shared by
+# every process using STORAGE_DIR. Entries live as long as the outputs they point to.
+CACHE_EXPIRY_SECONDS = 5 * 60
+conversion_cache = Cache(os.path.join(STORAGE_DIR, 'convertx_cache'))
+
+# Internal nginx location for converted files, e.g. /internal/; unset serves them from Flask
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX')
+# Apache (mod_xsendfile) and lighttpd fronts take the file path in an X-Sendfile header instead
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '0') == '1'
+
+# Min-heap of (expiry time, filepath) plus each live file's latest expiry, guarded by a lock
+file_expiry = []
+file_deadlines = {}
+file_expiry_lock = threading.Lock()
+# Process that runs the cleanup thread; forked workers start their own
+cleanup_thread_pid = None
+cleanup_thread = None
+# Set at interpreter exit to wake the cleanup thread and end its loop
+cleanup_stop = threading.Event()
 
 def cleanup_old_files():
-    """Clean up files older than 5 minutes"""
+    """Clean up files whose expiry time has passed"""
     current_time = time.time()
-    files_to_delete = []
+    expired_files = []
     
-    # Find expired files
-    for filepath, expiry_time in file_expiry.items():
-        if current_time > expiry_time:
-            try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                    logger.info(f"Cleaned up expired file: {filepath}")
-            except Exception as e:
-                logger.error(f"Error cleaning up file {filepath}: {str(e)}")
-            files_to_delete.append(filepath)
+    # Pop expired entries off the heap, skipping ones superseded by a later reschedule
+    with file_expiry_lock:
+        while file_expiry and file_expiry[0][0] <= current_time:
+            expiry, filepath = heapq.heappop(file_expiry)
+            if file_deadlines.get(filepath) == expiry:
+                del file_deadlines[filepath]
+                expired_files.append(filepath)
     
-    # Remove expired entries from dictionary
-    for filepath in files_to_delete:
-        file_expiry.pop(filepath, None)
+    # Delete outside the lock so scheduling never waits on disk; one unlink per
+    # file, since files moved or already removed just raise FileNotFoundError
+    for filepath in expired_files:
+        try:
+            os.remove(filepath)
+            logger.info("Cleaned up expired file: %s", filepath)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Error cleaning up file %s: %s", filepath, e)
 
 def schedule_cleanup(filepath, minutes=5):
     """Schedule a file for cleanup after specified minutes"""
-    file_expiry[filepath] = time.time() + (minutes * 60)
+    expiry = time.time() + (minutes * 60)
+    with file_expiry_lock:
+        heapq.heappush(file_expiry, (expiry, filepath))
+        file_deadlines[filepath] = expiry
+        start_cleanup_thread()
+
+def file_digest(path, chunk_size=COPY_BUFFER_SIZE):
+    """SHA-256 hex digest of a file on disk"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(buf)
+    return sha256.hexdigest()
 
-def compress_pdf(input_path, output_path, compression_level='medium'):
-    """Compress PDF based on compression level"""
+def save_upload(file, dst_path):
+    """Move a spooled upload into place and return its SHA-256 hex digest"""
+    if isinstance(file.stream, HashingSpoolFile):
+        file.stream.close()
+        os.replace(file.stream.name, dst_path)
+        return file.stream.sha256.hexdigest()
+    
+    sha256 = hashlib.sha256()
+    with open(dst_path, 'wb', buffering=COPY_BUFFER_SIZE) as dst:
+        for buf in iter(lambda: file.stream.read(COPY_BUFFER_SIZE), b''):
+            sha256.update(buf)
+            dst.write(buf)
+    return sha256.hexdigest()
+
+def stream_to_disk(dst_path, max_length, chunk_size=COPY_BUFFER_SIZE):
+    """Write the raw request body to disk in fixed-size chunks and return its SHA-256 hex digest.
+    
+    Chunked bodies have no Content-Length to check up front, so past max_length bytes the
+    partial file is removed and RequestEntityTooLarge is raised.
+    """
+    sha256 = hashlib.sha256()
+    written = 0
+    with open(dst_path, 'wb') as f:
+        while True:
+            buf = request.stream.read(chunk_size)
+            if not buf:
+                break
+            written += len(buf)
+            if written > max_length:
+                f.close()
+                os.remove(dst_path)
+                raise RequestEntityTooLarge()
+            sha256.update(buf)
+            f.write(buf)
+    return sha256.hexdigest()
+
+def fast_copy(src_path, dst_path):
+    """Hardlink src_path to dst_path, falling back to copy_file_range, sendfile, then a buffered copy"""
     try:
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-        
-        # Set compression parameters based on level
-        if compression_level == 'low':
-            image_quality = 60
-            compress_images = True
-        elif compression_level == 'medium':
-            image_quality = 40
-            compress_images = True
-        else:  # high
-            image_quality = 20
-            compress_images = True
-        
-        # Copy pages with compression
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Apply compression settings
-        writer.add_metadata(reader.metadata)
-        
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
+        os.link(src_path, dst_path)
+        return
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # Cross-device or a filesystem without hardlinks
+        pass
+    
+    # In-kernel copies, tried in order; each takes (src_fd, dst_fd, count, offset)
+    kernel_copies = []
+    if hasattr(os, 'copy_file_range'):
+        kernel_copies.append(lambda src_fd, dst_fd, count, offset: os.copy_file_range(src_fd, dst_fd, count, offset, offset))
+    if hasattr(os, 'sendfile'):
+        # sendfile writes at the destination's file position, which stays in step with offset
+        kernel_copies.append(lambda src_fd, dst_fd, count, offset: os.sendfile(dst_fd, src_fd, offset, count))
+
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        for copy_chunk in kernel_copies:
+            try:
+                offset = 0
+                while offset < size:
+                    copied = copy_chunk(src.fileno(), dst.fileno(), size - offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+                return
+            except OSError as e:
+                # e.g. copy_file_range across filesystems on older kernels; start over with the next one
+                logger.debug("In-kernel copy of %s failed, trying the next method: %s", src_path, e)
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+def get_cache_key(digest, output_format, compression_settings):
+    """Key a conversion by upload content, target format and compression settings"""
+    settings = json.dumps(compression_settings, sort_keys=True)
+    return f"{digest}:{output_format.upper()}:{settings}"
+
+def reuse_cached_output(cache_key, output_path):
+    """Copy a cached output into place; returns False on a cache miss"""
+    cached_path = conversion_cache.get(cache_key)
+    if not cached_path:
+        return False
+    
+    try:
+        fast_copy(cached_path, output_path)
+    except OSError:
+        # The cached output expired in the meantime
+        return False
+    
+    # The new link outlives the old one, so point the entry at it
+    conversion_cache.set(cache_key, output_path, expire=CACHE_EXPIRY_SECONDS)
+    logger.info("Reused cached conversion %s for %s", cached_path, output_path)
+    return True
+
+def detect_format(filename, head):
+    """Detect a file format from its leading bytes, falling back to the extension"""
+    _, extension = os.path.splitext(filename)
+    extension = extension.lower()
+    extension_format = FORMAT_FROM_EXTENSION.get(extension) or (extension[1:].upper() if extension else 'UNKNOWN')
+    
+    # Fast path for the formats this app converts
+    for signature, format_type in SIGNATURES.items():
+        if head.startswith(signature):
+            if format_type == 'ZIP' and extension_format in ZIP_CONTAINER_FORMATS:
+                return extension_format
+            return format_type
+    
+    # Fall back to libmagic for everything else
+    try:
+        mime_type = file_magic.from_buffer(head)
+    except magic.MagicException as e:
+        logger.warning("libmagic detection failed for %s: %s", filename, e)
+        mime_type = None
+    
+    if mime_type and mime_type not in GENERIC_MIME_TYPES:
+        return FORMAT_FROM_MIME.get(mime_type) or mime_type.split('/')[-1].upper()
+    return extension_format
+
+def convert_jpeg_on_gpu(input_path, output_path, quality):
+    """Re-encode a JPEG with nvJPEG without bringing the pixels back to the host.
+    
+    Returns False when the GPU can't do it (CUDA out of memory, a torchvision without
+    CUDA encode_jpeg, a JPEG nvJPEG rejects) so the CPU codecs take over.
+    """
+    try:
+        with open(input_path, 'rb') as f:
+            data = torch.frombuffer(bytearray(f.read()), dtype=torch.uint8)
+        pixels = decode_jpeg(data, mode=ImageReadMode.RGB, device='cuda')
+        with open(output_path, 'wb') as f:
+            f.write(encode_jpeg(pixels, quality=quality).cpu().numpy().tobytes())
         return True
     except Exception as e:
-        logger.error(f"Error compressing PDF: {str(e)}")
+        logger.warning("GPU JPEG conversion failed, falling back to the CPU: %s", e)
         return False
 
 def convert_image(input_path, output_path, output_format, quality=80):
     """Convert image to specified format with compression"""
     try:
-        logger.info(f"Starting image conversion to {output_format} with quality {quality}: {input_path}")
+        logger.info("Starting image conversion to %s with quality %s: %s", output_format, quality, input_path)
         start_time = time.time()
         
+        # Opening only parses the header, so this check costs no decode
+        target_format = output_format.upper()
+        if target_format in JPEG_FORMATS:
+            target_format = 'JPEG'
+        with Image.open(input_path) as img:
+            identity = img.format == target_format
+        if identity and quality >= IDENTITY_COPY_MIN_QUALITY:
+            fast_copy(input_path, output_path)
+            logger.info("Input is already %s; copied without re-encoding", target_format)
+            return True
+        
         with Image.open(input_path) as img:
+            # Let libjpeg downscale oversized JPEGs while decoding
+            original_dimensions = img.size
+            if img.format == 'JPEG' and max(img.size) > MAX_IMAGE_DIMENSION:
+                # draft() keeps both sides at least the requested size, so ask for the
+                # aspect-preserving size whose long side is MAX_IMAGE_DIMENSION
+                scale = MAX_IMAGE_DIMENSION / max(img.size)
+                img.draft('RGB', (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+            drafted = img.size != original_dimensions
+            if drafted:
+                logger.info("Decoding oversized JPEG at reduced size %s", img.size)
+            
             # Convert to RGB if saving as JPEG
-            if output_format.upper() in ['JPG', 'JPEG']:
+            if target_format == 'JPEG':
                 if img.mode in ('RGBA', 'LA'):
+                    # paste blends onto white in one C pass over the alpha band, several
+                    # times faster than the same blend written with NumPy arrays
                     background = Image.new('RGB', img.size, (255, 255, 255))
-                    background.paste(img, mask=img.split()[-1])
+                    background.paste(img, mask=img.getchannel('A'))
                     img = background
                 elif img.mode != 'RGB':
                     img = img.convert('RGB')
             
             # Save with compression
-            if output_format.upper() in ['JPG', 'JPEG']:
+            if (target_format == 'JPEG' and gpu_jpeg and img.format == 'JPEG'
+                    and not drafted and img.width * img.height >= GPU_JPEG_MIN_PIXELS
+                    and convert_jpeg_on_gpu(input_path, output_path, quality)):
+                # Decoded and re-encoded on the GPU
+                pass
+            elif target_format == 'JPEG' and turbo_jpeg is not None:
+                # JPEG input is decoded by libjpeg-turbo as well, skipping Pillow's decoder
+                if img.format == 'JPEG' and not drafted:
+                    with open(input_path, 'rb') as f:
+                        pixels = turbo_jpeg.decode(f.read(), pixel_format=TJPF_RGB)
+                else:
+                    pixels = np.asarray(img)
+                with open(output_path, 'wb') as f:
+                    f.write(turbo_jpeg.encode(pixels, quality=quality,
+                                              pixel_format=TJPF_RGB,
+                                              jpeg_subsample=TJSAMP_420,
+                                              flags=TJFLAG_PROGRESSIVE if JPEG_PROGRESSIVE else 0))
+            elif target_format == 'JPEG':
                 # For JPEG, quality is directly proportional (higher = better quality)
                 img.save(output_path, 'JPEG', 
                         quality=quality,  # quality from 1 (worst) to 95 (best)
-                        optimize=True)
-            elif output_format.upper() == 'PNG':
+                        optimize=JPEG_OPTIMIZE,
+                        progressive=JPEG_PROGRESSIVE)
+            elif target_format == 'PNG':
                 # For PNG, we need to handle compression differently
                 # PNG uses optimize and compression_level
                 # compression_level: 0 (no compression) to 9 (max compression)
@@ -134,53 +527,293 @@ def convert_image(input_path, output_path, output_format, quality=80):
                         optimize=True,
                         compression_level=compression_level)  # 0-9 (0=none, 9=max)
             else:
-                img.save(output_path, output_format.upper())
+                img.save(output_path, target_format)
         
         # Log file sizes for debugging
         original_size = os.path.getsize(input_path)
         converted_size = os.path.getsize(output_path)
-        logger.info(f"Original size: {original_size/1024:.2f}KB")
-        logger.info(f"Converted size: {converted_size/1024:.2f}KB")
-        logger.info(f"Compression ratio: {(converted_size/original_size)*100:.2f}%")
+        logger.info("Original size: %.2fKB", original_size/1024)
+        logger.info("Converted size: %.2fKB", converted_size/1024)
+        logger.info("Compression ratio: %.2f%%", (converted_size/original_size)*100)
         
         end_time = time.time()
-        logger.info(f"Conversion completed in {end_time - start_time:.2f} seconds")
+        logger.info("Conversion completed in %.2f seconds", end_time - start_time)
         return True
     except Exception as e:
-        logger.error(f"Error converting image: {str(e)}")
+        logger.error("Error converting image: %s", e)
         return False
 
+def parse_pdf_pages(shard):
+    """Parse one page range of a PDF in a worker process and serialize it to JSON"""
+    pdf_path, start, end, json_path = shard
+    cv = Converter(pdf_path)
+    settings = cv.default_settings
+    
+    # The whole document is analyzed for layout, but only this range is parsed
+    cv.load_pages()
+    for page in cv.pages:
+        page.skip_parsing = not (start <= page.id < end)
+    cv.parse_document(**settings).parse_pages(**settings).serialize(json_path)
+    cv.close()
+
+def convert_pdf_pages_parallel(cv, pdf_path, output_path):
+    """Parse page ranges on a process pool, then build the DOCX in this process"""
+    page_count = len(cv.fitz_doc)
+    workers = PDF_PAGE_WORKERS
+    shard_size = min(PDF_SHARD_PAGES, math.ceil(page_count / workers))
+    
+    # Each conversion gets its own directory for the parsed page ranges
+    shard_dir = tempfile.mkdtemp(prefix='pdf_shards_', dir=UPLOAD_DIR)
+    try:
+        shards = [
+            (pdf_path, start, min(start + shard_size, page_count), os.path.join(shard_dir, f'{start}.json'))
+            for start in range(0, page_count, shard_size)
+        ]
+        logger.info("Parsing %s pages in %s ranges on %s processes", page_count, len(shards), workers)
+        with pdf_page_context.Pool(processes=min(workers, len(shards))) as pool:
+            pool.map(parse_pdf_pages, shards)
+        
+        for _, _, _, json_path in shards:
+            cv.deserialize(json_path)
+        cv.make_docx(output_path, **cv.default_settings)
+    finally:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
 def convert_pdf_to_docx(input_path, output_path, compression_level='medium'):
     """Convert PDF to DOCX with compression"""
     try:
-        logger.info(f"Starting PDF to DOCX conversion with {compression_level} compression: {input_path}")
+        logger.info("Starting PDF to DOCX conversion with %s compression: %s", compression_level, input_path)
         start_time = time.time()
         
-        # First compress the PDF if needed
-        if compression_level != 'low':
-            temp_pdf = os.path.join(tempfile.gettempdir(), f'compressed_{uuid.uuid4().hex}.pdf')
-            if not compress_pdf(input_path, temp_pdf, compression_level):
-                logger.warning("PDF compression failed, using original file")
-                temp_pdf = input_path
+        # Convert the upload as-is (pdf2docx re-extracts text and images itself), spreading
+        # the pages of long documents across processes
+        cv = Converter(input_path)
+        # Celery's prefork children are daemonic and cannot start a pool, and a
+        # single page worker would only add process start-up to a serial parse
+        if (parallel_pdf_pages and PDF_PAGE_WORKERS > 1 and len(cv.fitz_doc) >= PARALLEL_PDF_MIN_PAGES
+                and not current_process().daemon
+                and pdf_pool_lock.acquire(blocking=False)):
+            try:
+                convert_pdf_pages_parallel(cv, input_path, output_path)
+            finally:
+                pdf_pool_lock.release()
         else:
-            temp_pdf = input_path
-        
-        # Convert to DOCX
-        cv = Converter(temp_pdf)
-        cv.convert(output_path)
+            cv.convert(output_path)
         cv.close()
         
-        # Clean up temporary file
-        if temp_pdf != input_path and os.path.exists(temp_pdf):
-            os.remove(temp_pdf)
-        
         end_time = time.time()
-        logger.info(f"Conversion completed in {end_time - start_time:.2f} seconds")
+        logger.info("Conversion completed in %.2f seconds", end_time - start_time)
         return True
     except Exception as e:
-        logger.error(f"Error converting PDF to DOCX: {str(e)}")
+        logger.error("Error converting PDF to DOCX: %s", e)
         return False
 
+def warm_up():
+    """Run a tiny PDF and image conversion so lazy imports and font caches load up front"""
+    import fitz
+    from PIL import JpegImagePlugin, PngImagePlugin
+    
+    start_time = time.time()
+    warmup_dir = tempfile.mkdtemp(prefix='convertx_warmup_')
+    try:
+        pdf_path = os.path.join(warmup_dir, 'warmup.pdf')
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), 'ConvertX')
+        doc.save(pdf_path)
+        doc.close()
+        
+        cv = Converter(pdf_path)
+        cv.convert(os.path.join(warmup_dir, 'warmup.docx'))
+        cv.close()
+        
+        Image.new('RGB', (8, 8)).save(os.path.join(warmup_dir, 'warmup.jpg'), 'JPEG')
+    except Exception as e:
+        logger.warning("Warm-up failed: %s", e)
+    finally:
+        shutil.rmtree(warmup_dir, ignore_errors=True)
+    
+    logger.info("Warm-up completed in %.2f seconds", time.time() - start_time)
+    log_imaging_build()
+
+def log_imaging_build():
+    """Log which Pillow build and JPEG codec are loaded; Pillow-SIMD releases carry a .postN version"""
+    simd = '.post' in PIL.__version__
+    logger.info("Pillow %s loaded (%s)", PIL.__version__,
+                'SIMD build' if simd else 'stock build, install Pillow-SIMD for vectorized kernels')
+    if features.check_feature('libjpeg_turbo'):
+        logger.info("Pillow JPEG codec: libjpeg-turbo %s", features.version('libjpeg_turbo'))
+    else:
+        logger.warning("Pillow is not linked against libjpeg-turbo; JPEG encoding will be slower")
+
+def convert_image_with_settings(input_path, output_path, compression_settings, output_format):
+    """Convert an image using the quality from the request's compression settings"""
+    quality = compression_settings.get('quality', 80)
+    return convert_image(input_path, output_path, output_format, quality)
+
+def convert_pdf_with_settings(input_path, output_path, compression_settings):
+    """Convert a PDF using the level from the request's compression settings"""
+    compression_level = compression_settings.get('level', 'medium')
+    return convert_pdf_to_docx(input_path, output_path, compression_level)
+
+# Converter for every supported (input format, output format) pair
+CONVERTERS = {('PDF', 'DOCX'): convert_pdf_with_settings}
+for image_input in ['JPG', 'JPEG', 'PNG', 'BMP']:
+    for image_output in ['PNG', 'JPG', 'JPEG']:
+        CONVERTERS[(image_input, image_output)] = functools.partial(
+            convert_image_with_settings, output_format=image_output)
+
+# Output formats offered for each input format
+SUPPORTED_FORMATS = {}
+for source_format, target_format in CONVERTERS:
+    SUPPORTED_FORMATS.setdefault(source_format, []).append(target_format)
+
+# Content type of each output extension served by /download
+DOWNLOAD_MIME_TYPES = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+}
+
+# Characters kept when an upload's name is reused for its files on disk
+UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+# Longest sanitized name stem kept
+MAX_NAME_STEM = 120
+
+def storage_paths(filename, output_format):
+    """Unique upload and output paths for a file, named after its sanitized original name.
+    
+    One random token per file keeps names unique for their short lifetime; the
+    output keeps 8 hex characters of it so download links stay hard to guess.
+    """
+    token = secrets.token_hex(8)
+    stem, extension = os.path.splitext(UNSAFE_FILENAME_CHARS.sub('_', filename).strip('._'))
+    stem = stem[:MAX_NAME_STEM]
+    input_path = os.path.join(UPLOAD_DIR, f"{token}_{stem}{extension}")
+    output_path = os.path.join(CONVERTED_DIR, f"{stem}_{token[:8]}.{output_format.lower()}")
+    return input_path, output_path
+
+def get_input_format(filename):
+    """Input format of an upload, taken from its extension like the frontend does"""
+    _, extension = os.path.splitext(filename)
+    return extension[1:].upper()
+
+def get_converter(input_format, output_format):
+    """Look up the converter for a format pair, raising ValueError if it is unsupported"""
+    converter = CONVERTERS.get((input_format, output_format.upper()))
+    if converter is None:
+        raise ValueError(f'Conversion from {input_format or "UNKNOWN"} to {output_format.upper()} not supported')
+    return converter
+
+def run_conversion(input_path, output_path, input_format, output_format, compression_settings, cache_key=None):
+    """Dispatch a saved upload to the matching converter and cache the output"""
+    convert = get_converter(input_format, output_format)
+    success = convert(input_path, output_path, compression_settings)
+    
+    if success and cache_key:
+        conversion_cache.set(cache_key, output_path, expire=CACHE_EXPIRY_SECONDS)
+    return success
+
+if celery is not None:
+    # Celery worker processes warm up the same way gunicorn workers do
+    worker_process_init.connect(lambda **kwargs: warm_up(), weak=False)
+    
+    class ConversionTask(celery.Task):
+        """Task base that ties output expiry to the task outcome"""
+        
+        def on_success(self, retval, task_id, args, kwargs):
+            # Expiry starts once the output actually exists and the input is no longer needed
+            schedule_cleanup(args[0])
+            schedule_cleanup(args[1])
+        
+        def on_failure(self, exc, task_id, args, kwargs, einfo):
+            # Drop any partially written output right away
+            schedule_cleanup(args[0])
+            try:
+                os.remove(args[1])
+            except OSError:
+                pass
+    
+    def enqueue_conversion(input_path, *args):
+        """Queue a conversion; the task starts the input's expiry once it finishes"""
+        schedule_cleanup(input_path, minutes=QUEUED_INPUT_EXPIRY_MINUTES)
+        return convert_task.delay(input_path, *args)
+    
+    @celery.task(base=ConversionTask, name='convertx.convert')
+    def convert_task(input_path, output_path, input_format, output_format, compression_settings, cache_key=None):
+        """Run a conversion on a Celery worker"""
+        if not run_conversion(input_path, output_path, input_format, output_format, compression_settings, cache_key):
+            raise RuntimeError('Conversion failed')
+        
+        return {'downloadLink': f"/download/{os.path.basename(output_path)}"}
+
+def conversion_result(filename, output_path, success):
+    """Build the response entry for a finished conversion"""
+    if not success:
+        return {
+            'filename': filename,
+            'status': 'error',
+            'error': 'Conversion failed'
+        }
+    
+    # Schedule cleanup for output file
+    schedule_cleanup(output_path)
+    # Generate download URL
+    download_url = f"/download/{os.path.basename(output_path)}"
+    return {
+        'filename': filename,
+        'status': 'success',
+        'downloadLink': download_url
+    }
+
+def init_conversion_worker(parent_pid):
+    """Prepare a batch pool worker: no nested page pools, libraries loaded up front"""
+    global parallel_pdf_pages
+    parallel_pdf_pages = False
+    threading.Thread(target=exit_with_parent, args=(parent_pid,), name='convertx-parent-watch',
+                     daemon=True).start()
+    warm_up()
+
+def exit_with_parent(parent_pid):
+    """Exit a pool worker once its parent is gone.
+    
+    Workers hold both ends of the pool's call queue, so a parent killed
+    without shutting the pool down (gunicorn timeouts, SIGKILL) would
+    otherwise leave them blocked forever.
+    """
+    while os.getppid() == parent_pid:
+        time.sleep(5)
+    os._exit(0)
+
+def get_conversion_pool():
+    """Return this process's conversion pool, creating it on first use.
+    
+    Workers are spawned rather than forked, since forking a threaded
+    gunicorn worker can copy locks held by other threads.
+    """
+    global conversion_pool, conversion_pool_pid
+    with conversion_pool_lock:
+        if conversion_pool is None or conversion_pool_pid != os.getpid():
+            conversion_pool = ProcessPoolExecutor(max_workers=CONVERSION_PROCESSES,
+                                                  mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=init_conversion_worker,
+                                                  initargs=(os.getpid(),))
+            conversion_pool_pid = os.getpid()
+        return conversion_pool
+
+def discard_conversion_pool(pool):
+    """Drop a pool whose worker died so the next batch starts a fresh one"""
+    global conversion_pool
+    with conversion_pool_lock:
+        if conversion_pool is pool:
+            conversion_pool = None
+    pool.shutdown(wait=False)
+
+@app.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    """Reject uploads over MAX_CONTENT_LENGTH with the same JSON error on every endpoint"""
+    return jsonify({'error': 'File too large'}), 413
+
 @app.route('/', methods=['GET', 'OPTIONS'])
 def health_check():
     """Health check endpoint"""
@@ -188,6 +821,11 @@ def health_check():
         return '', 204
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/formats')
+def supported_formats():
+    """Endpoint listing the output formats available for each input format"""
+    return jsonify(SUPPORTED_FORMATS)
+
 @app.route('/detect', methods=['POST'])
 def detect_file_format():
     """Endpoint to detect file format"""
@@ -199,27 +837,17 @@ def detect_file_format():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Save the file
-        filename = str(uuid.uuid4()) + '_' + file.filename
-        filepath = os.path.join(UPLOAD_DIR, filename)
-        file.save(filepath)
+        # Detect format from the leading bytes; nothing needs to persist
+        head = file.stream.read(DETECT_HEAD_BYTES)
+        format_type = detect_format(file.filename, head)
         
-        # Schedule cleanup
-        schedule_cleanup(filepath)
-        
-        # Detect format
-        mime_type, _ = mimetypes.guess_type(file.filename)
-        if mime_type:
-            format_type = mime_type.split('/')[-1].upper()
-        else:
-            _, extension = os.path.splitext(file.filename)
-            format_type = extension[1:].upper() if extension else 'UNKNOWN'
-        
-        logger.info(f"Detected format {format_type} for file {file.filename}")
+        logger.info("Detected format %s for file %s", format_type, file.filename)
         return jsonify({'format': format_type})
     
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in detect_file_format: {str(e)}")
+        logger.error("Error in detect_file_format: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/convert', methods=['POST'])
@@ -229,107 +857,243 @@ def convert_files():
         if 'files' not in request.files:
             return jsonify({'error': 'No files provided'}), 400
 
+        # Read every per-file field once up front
         files = request.files.getlist('files')
-        results = []
+        output_formats = [(request.form.get(f'outputFormats[{i}]') or '').upper() for i in range(len(files))]
+        compression_strs = [request.form.get(f'compression[{i}]') for i in range(len(files))]
+        results = [None] * len(files)
+        tasks = []
         
+        # Save all uploads first so the conversions can run in parallel
         for i, file in enumerate(files):
             try:
                 # Get output format and compression settings
-                output_format = request.form.get(f'outputFormats[{i}]')
-                compression_str = request.form.get(f'compression[{i}]')
+                output_format = output_formats[i]
+                compression_str = compression_strs[i]
                 compression_settings = json.loads(compression_str) if compression_str else {}
                 
                 if not output_format:
                     raise ValueError(f'No output format specified for file {file.filename}')
                 
-                # Save input file
-                input_filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
-                input_path = os.path.join(UPLOAD_DIR, input_filename)
-                file.save(input_path)
-                schedule_cleanup(input_path)
-                
-                # Generate output filename
-                name_without_ext = os.path.splitext(secure_filename(file.filename))[0]
-                output_filename = f"{name_without_ext}_{uuid.uuid4().hex[:8]}.{output_format.lower()}"
-                output_path = os.path.join(CONVERTED_DIR, output_filename)
+                # Reject unsupported pairs before anything is written
+                input_format = get_input_format(file.filename)
+                get_converter(input_format, output_format)
                 
-                success = False
-                # Handle image conversion
-                if output_format.upper() in ['PNG', 'JPG', 'JPEG']:
-                    quality = compression_settings.get('quality', 80)
-                    success = convert_image(input_path, output_path, output_format, quality)
+                # Save input file
+                input_path, output_path = storage_paths(file.filename, output_format)
+                digest = save_upload(file, input_path)
                 
-                # Handle PDF to DOCX conversion
-                elif output_format.upper() == 'DOCX':
-                    compression_level = compression_settings.get('level', 'medium')
-                    success = convert_pdf_to_docx(input_path, output_path, compression_level)
+                # Skip the conversion entirely when this upload was converted before
+                cache_key = get_cache_key(digest, output_format, compression_settings)
+                if reuse_cached_output(cache_key, output_path):
+                    schedule_cleanup(input_path)
+                    results[i] = conversion_result(file.filename, output_path, True)
+                    continue
                 
-                if success:
-                    # Schedule cleanup for output file
-                    schedule_cleanup(output_path)
-                    # Generate download URL
-                    download_url = f"/download/{os.path.basename(output_path)}"
-                    results.append({
-                        'filename': file.filename,
-                        'status': 'success',
-                        'downloadLink': download_url
-                    })
-                else:
-                    results.append({
+                # Hand off to the task queue when one is configured
+                if celery is not None:
+                    task = enqueue_conversion(input_path, output_path, input_format, output_format,
+                                              compression_settings, cache_key)
+                    results[i] = {
                         'filename': file.filename,
-                        'status': 'error',
-                        'error': 'Conversion failed'
-                    })
+                        'status': 'pending',
+                        'taskId': task.id
+                    }
+                    continue
+                
+                schedule_cleanup(input_path)
+                tasks.append((i, file.filename, input_path, output_path, input_format, output_format,
+                              compression_settings, cache_key))
                 
             except Exception as e:
-                logger.error(f"Error processing file {file.filename}: {str(e)}")
-                results.append({
+                logger.error("Error processing file %s: %s", file.filename, e)
+                results[i] = {
                     'filename': file.filename,
                     'status': 'error',
                     'error': str(e)
-                })
+                }
+        
+        # A single file converts in this thread, where large PDFs can still fan out by page
+        if len(tasks) == 1:
+            i, filename, _, output_path, *_ = tasks[0]
+            results[i] = conversion_result(filename, output_path, run_conversion(*tasks[0][2:]))
+        
+        # Batches convert one file per process; only paths and settings are pickled
+        elif tasks:
+            pool = get_conversion_pool()
+            futures = {pool.submit(run_conversion, *task[2:]): task for task in tasks}
+            
+            for future in as_completed(futures):
+                i, filename, _, output_path, *_ = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        discard_conversion_pool(pool)
+                    logger.error("Error processing file %s: %s", filename, e)
+                    results[i] = {
+                        'filename': filename,
+                        'status': 'error',
+                        'error': str(e)
+                    }
+                    continue
+                
+                results[i] = conversion_result(filename, output_path, success)
                 
         return jsonify(results)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in convert_files: {str(e)}")
+        logger.error("Error in convert_files: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/convert-raw', methods=['PUT'])
+def convert_raw():
+    """Endpoint to convert a single file sent as the raw request body.
+    
+    Query parameters: filename, outputFormat and an optional JSON compression object.
+    """
+    try:
+        filename = request.args.get('filename')
+        output_format = request.args.get('outputFormat')
+        compression_str = request.args.get('compression')
+        compression_settings = json.loads(compression_str) if compression_str else {}
+        
+        if not filename or not output_format:
+            return jsonify({'error': 'filename and outputFormat are required'}), 400
+        
+        output_format = output_format.upper()
+        input_format = get_input_format(filename)
+        if (input_format, output_format) not in CONVERTERS:
+            return jsonify({'error': f'Conversion from {input_format or "UNKNOWN"} to {output_format} not supported'}), 400
+        
+        max_length = app.config['MAX_CONTENT_LENGTH']
+        if request.content_length and request.content_length > max_length:
+            raise RequestEntityTooLarge()
+        
+        # Stream the body to disk without going through the form parser
+        input_path, output_path = storage_paths(filename, output_format)
+        digest = stream_to_disk(input_path, max_length)
+        
+        # Skip the conversion entirely when this upload was converted before
+        cache_key = get_cache_key(digest, output_format, compression_settings)
+        if reuse_cached_output(cache_key, output_path):
+            schedule_cleanup(input_path)
+            return jsonify(conversion_result(filename, output_path, True))
+        
+        # Hand off to the task queue when one is configured
+        if celery is not None:
+            task = enqueue_conversion(input_path, output_path, input_format, output_format,
+                                      compression_settings, cache_key)
+            return jsonify({'filename': filename, 'status': 'pending', 'taskId': task.id})
+        
+        schedule_cleanup(input_path)
+        success = run_conversion(input_path, output_path, input_format, output_format,
+                                 compression_settings, cache_key)
+        return jsonify(conversion_result(filename, output_path, success))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in convert_raw: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/status/<task_id>')
+def task_status(task_id):
+    """Endpoint to poll the state of a queued conversion"""
+    if celery is None:
+        return jsonify({'error': 'Task queue not configured'}), 404
+    
+    try:
+        result = AsyncResult(task_id, app=celery)
+        state = result.state
+        response = {'taskId': task_id, 'state': state}
+        if state == 'SUCCESS':
+            response.update(result.result)
+        elif state == 'FAILURE':
+            response['error'] = str(result.result)
+        
+        return jsonify(response)
+    
+    except Exception as e:
+        logger.error("Error in task_status for %s: %s", task_id, e)
         return jsonify({'error': str(e)}), 500
 
 @app.route('/download/<filename>')
 def download_file(filename):
     """Endpoint to download converted files"""
     try:
-        file_path = os.path.join(CONVERTED_DIR, filename)
-        if not os.path.exists(file_path):
+        file_path = safe_join(CONVERTED_DIR, filename)
+        if file_path is None or not os.path.exists(file_path):
             return jsonify({'error': 'File not found'}), 404
 
         # Get the correct MIME type
-        mime_type, _ = mimetypes.guess_type(filename)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
+        _, extension = os.path.splitext(filename)
+        mime_type = DOWNLOAD_MIME_TYPES.get(extension.lower(), 'application/octet-stream')
 
-        # Send file with proper MIME type and as_attachment=True
+        # Let nginx send the file with sendfile(2) when it fronts the app
+        if X_ACCEL_REDIRECT_PREFIX:
+            response = app.response_class(mimetype=mime_type)
+            response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX + filename
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+
+        # Conditional responses support Range requests, ETags and 304s; gunicorn
+        # serves the wsgi.file_wrapper body with sendfile(2). The path is already
+        # validated above, and send_from_directory drops the ETag on Flask 2.0.
         return send_file(
             file_path,
             mimetype=mime_type,
             as_attachment=True,
-            download_name=filename
+            download_name=filename,
+            conditional=True,
+            etag=True,
+            last_modified=os.path.getmtime(file_path),
+            max_age=CACHE_EXPIRY_SECONDS
         )
 
     except Exception as e:
-        logger.error(f"Error downloading file {filename}: {str(e)}")
+        logger.error("Error downloading file %s: %s", filename, e)
         return jsonify({'error': str(e)}), 500
 
+@app.after_request
+def advertise_ranges(response):
+    """Tell clients that downloads can be resumed with Range requests"""
+    if request.path.startswith('/download/') and response.status_code in (200, 206):
+        response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
 # Start periodic cleanup
 def periodic_cleanup():
-    """Run cleanup every minute"""
-    cleanup_old_files()
-    Timer(60.0, periodic_cleanup).start()
+    """Run cleanup every minute until cleanup_stop is set"""
+    while True:
+        cleanup_old_files()
+        if cleanup_stop.wait(60.0):
+            return
+
+def start_cleanup_thread():
+    """Start the cleanup thread unless this process already runs one.
+    
+    Started lazily from schedule_cleanup, so workers forked after import
+    (gunicorn --preload, Celery prefork) each get a thread of their own.
+    """
+    global cleanup_thread_pid, cleanup_thread
+    if cleanup_thread_pid == os.getpid():
+        return
+    cleanup_thread_pid = os.getpid()
+    cleanup_thread = threading.Thread(target=periodic_cleanup, name='convertx-cleanup', daemon=True)
+    cleanup_thread.start()
 
-# Start the cleanup timer
-periodic_cleanup()
+@atexit.register
+def stop_cleanup_thread():
+    """Let an in-progress cleanup pass finish before the process exits"""
+    cleanup_stop.set()
+    if cleanup_thread is not None and cleanup_thread_pid == os.getpid():
+        cleanup_thread.join(timeout=5)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    logger.info(f"Starting server on port {port}")
+    logger.info("Starting development server on port %s; use gunicorn (see Procfile) in production", port)
+    warm_up()
     app.run(host='0.0.0.0', port=port) 
\ No newline at end of file
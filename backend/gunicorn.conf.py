@@ -0,0 +1,10 @@
+# Gunicorn loads this file from the working directory automatically
+
+def post_worker_init(worker):
+    """Load pdf2docx's lazy imports and font caches before the worker takes requests.
+
+    This adds about a second to worker boot but removes the stall on the
+    first conversion after a cold start.
+    """
+    from app import warm_up
+    warm_up()
@@ -13,6 +13,12 @@ const GOOGLE_CLIENT_ID = process.env.REACT_APP_GOOGLE_CLIENT_ID;
 const GOOGLE_API_KEY = process.env.REACT_APP_GOOGLE_API_KEY;
 const GOOGLE_APP_ID = process.env.REACT_APP_GOOGLE_APP_ID;
 
+// Queued conversion polling; outputs expire after five minutes, so waiting longer is pointless
+const TASK_POLL_INTERVAL_MS = 1000;
+const TASK_MAX_WAIT_MS = 5 * 60 * 1000;
+// Celery states of a task that is still waiting or running
+const TASK_ACTIVE_STATES = ['PENDING', 'RECEIVED', 'STARTED', 'RETRY'];
+
 function App() {
   const [files, setFiles] = useState([]);
   const [fileInfos, setFileInfos] = useState([]);
@@ -347,6 +353,28 @@ function App() {
     }));
   };
   
+  // Poll a queued conversion until it finishes, fails or runs out of time
+  const waitForTask = async (backendUrl, result) => {
+    const deadline = Date.now() + TASK_MAX_WAIT_MS;
+    while (Date.now() < deadline) {
+      const response = await fetch(`${backendUrl}/status/${result.taskId}`);
+      if (!response.ok) {
+        return { ...result, status: 'error', error: 'Conversion failed' };
+      }
+
+      const task = await response.json();
+      if (task.state === 'SUCCESS') {
+        return { ...result, status: 'success', downloadLink: task.downloadLink };
+      }
+      // FAILURE, REVOKED and anything unrecognised end the wait
+      if (!TASK_ACTIVE_STATES.includes(task.state)) {
+        return { ...result, status: 'error', error: task.error || 'Conversion failed' };
+      }
+      await new Promise(resolve => setTimeout(resolve, TASK_POLL_INTERVAL_MS));
+    }
+    return { ...result, status: 'error', error: 'Conversion timed out' };
+  };
+
   // Update the conversion function to include compression settings
   const convertFiles = async () => {
     setIsLoading(true);
@@ -373,13 +401,19 @@ function App() {
         throw new Error('Conversion failed');
       }
       
-      const results = await response.json();
-      // Add the backend URL to the download links
-      const resultsWithFullUrls = results.map(result => ({
-        ...result,
-        downloadLink: result.downloadLink ? `${backendUrl}${result.downloadLink}` : null
-      }));
-      setConversionResults(resultsWithFullUrls);
+      const queuedResults = await response.json();
+      // Wait for any conversions handed off to the task queue and add the
+      // backend URL to the download links in the same pass
+      const results = await Promise.all(
+        queuedResults.map(async queued => {
+          const result = queued.taskId ? await waitForTask(backendUrl, queued) : queued;
+          return {
+            ...result,
+            downloadLink: result.downloadLink ? `${backendUrl}${result.downloadLink}` : null
+          };
+        })
+      );
+      setConversionResults(results);
       setConversionComplete(true);
     } catch (err) {
       console.error('Error during conversion:', err);